@@ -1,352 +1,482 @@
+import re
+from functools import lru_cache
 from shlex import split, quote
 from shutil import which
-from re import search
-from typing import Union, Tuple, List
-from os import makedirs
+from typing import Optional, Union, Tuple, List
+from os import environ, makedirs
+from os.path import isdir
+
+# Arguments made of these chars are split and quoted by shlex as is
+_SAFE_ARGS_RE = re.compile(r"[-\w=.,/ ]*", re.ASCII)
 
 
 def parse_escape_args(args: str = "") -> List[str]:
     """Parses and escapes arguments"""
-    return list(map(quote, split(args)))
+    if not args:
+        return []
+    if _SAFE_ARGS_RE.fullmatch(args):
+        # Nothing to unquote or escape
+        return args.split()
+    return [quote(arg) for arg in split(args)]
+
+
+@lru_cache(maxsize=None)
+def _cached_which(binary: str, path: Optional[str]) -> Optional[str]:
+    """Looks up a binary in PATH once per binary name and PATH value"""
+    return which(binary, path=path)
+
+
+# Binaries used by the most common formats are resolved once, when
+# ranger loads the plugin, so that first commands do not walk PATH
+_COMMON_BINS = (
+    "tar", "7z", "zip", "unzip", "gzip", "pigz", "bzip2", "pbzip2", "xz", "pixz")
+
+for _binary in _COMMON_BINS:
+    _cached_which(_binary, environ.get("PATH"))
 
 
 def find_binaries(
-        binaries: List[str]) -> Union[Tuple[str, str], Tuple[None, None]]:
+        binaries: Tuple[str, ...]) -> Union[Tuple[str, str], Tuple[None, None]]:
     """Finds archivers binaries in PATH"""
-    res = list(filter(
-        lambda x: x[1] is not None,
-        zip(binaries, map(which, binaries))))
-    return res[0] if res else (None, None)
+    return _find_binaries(tuple(binaries), environ.get("PATH"))
+
+
+@lru_cache(maxsize=None)
+def _find_binaries(
+        binaries: Tuple[str, ...],
+        path: Optional[str]) -> Union[Tuple[str, str], Tuple[None, None]]:
+    """Finds the first of archivers binaries in PATH"""
+    for binary in binaries:
+        binary_path = _cached_which(binary, path)
+        if binary_path is not None:
+            return binary, binary_path
+    return None, None
+
+
+def clear_binary_cache() -> None:
+    """Forgets found binaries and built commands, e.g. after an archiver
+    was installed or removed
+    """
+    _cached_which.cache_clear()
+    _find_binaries.cache_clear()
+    _compression_command.cache_clear()
+    _decompression_command.cache_clear()
+
+
+# Flags enabling multithreaded compression for the binaries that run
+# single-threaded by default. pigz, pbzip2, lbzip2, pixz and plzip
+# already use all available cores.
+_PARALLEL_FLAGS = {
+    "xz": ("-T0",),
+    "zstd": ("-T0",),
+}
+
+
+def _compress_tarball(
+        binary: str,
+        binary_path: str,
+        archive_name: str,
+        flags: Tuple[str, ...],
+        files: Tuple[str, ...]) -> List[str]:
+    """Returns tar command filtered through a compression program"""
+    program = binary_path
+    if binary in _PARALLEL_FLAGS:
+        # tar splits the program string into arguments
+        program = " ".join([quote(binary_path), *_PARALLEL_FLAGS[binary]])
+    command = ["tar", "-cf", archive_name, "--use-compress-program", program, *flags, *files]
+    return command
+
+
+def _compress_files(
+        binary: str,
+        binary_path: str,
+        archive_name: str,
+        flags: Tuple[str, ...],
+        files: Tuple[str, ...]) -> List[str]:
+    """Returns command compressing each file separately"""
+    command = [binary_path, *_PARALLEL_FLAGS.get(binary, ()), *flags, *files]
+    return command
 
 
-def get_compression_command(
+def _compress_files_keep(
+        binary: str,
+        binary_path: str,
         archive_name: str,
-        flags: List[str],
-        files: List[str]) -> List[str]:
-    """Returns compression command"""
-    if search(r"\.(tar\.|t)bz[2]*$", archive_name) is not None:
-        # Matches:
-        # .tar.bz2
-        # .tar.bz
-        # .tbz2
-        # .tbz
-        bins = ["pbzip2", "lbzip2", "bzip2"]
-        binary, binary_path = find_binaries(bins)
-
-        if binary:
-            command = ["tar", "-cf", archive_name, "--use-compress-program", binary_path, *flags, *files]
-            return command
-
-    elif search(r"\.bz[2]*$", archive_name) is not None:
-        # Matches:
-        # .bz2
-        # .bz
-        bins = ["pbzip2", "lbzip2", "bzip2"]
-        binary, binary_path = find_binaries(bins)
-        flags_mod = flags + ['-k']
+        flags: Tuple[str, ...],
+        files: Tuple[str, ...]) -> List[str]:
+    """Returns command compressing each file separately and keeping
+    the input files
+    """
+    command = [binary_path, *flags, '-k', *files]
+    return command
+
+
+def _compress_lz4(
+        binary: str,
+        binary_path: str,
+        archive_name: str,
+        flags: Tuple[str, ...],
+        files: Tuple[str, ...]) -> List[str]:
+    """Returns lz4 compression command"""
+    if len(files) > 1:
+        # multiple files imply automatic output names
+        command = [binary_path, *flags, '-m', *files]
+    else:
+        command = [binary_path, *flags, *files, archive_name]
+    return command
+
+
+def _compress_lzop(
+        binary: str,
+        binary_path: str,
+        archive_name: str,
+        flags: Tuple[str, ...],
+        files: Tuple[str, ...]) -> List[str]:
+    """Returns lzop compression command"""
+    if len(files) > 1:
+        command = [binary_path, *flags, *files]
+    else:
+        command = [binary_path, *flags, '-o', archive_name, *files]
+    return command
+
+
+def _compress_7z(
+        binary: str,
+        binary_path: str,
+        archive_name: str,
+        flags: Tuple[str, ...],
+        files: Tuple[str, ...]) -> List[str]:
+    """Returns 7z compression command"""
+    # -r enables recursion into subdirs
+    command = [binary, "a", *flags, "-r", archive_name, *files]
+    return command
 
-        if binary:
-            command = [binary_path, *flags_mod, *files]
-            return command
-
-    elif search(r"\.(tar\.(gz|z)|t(g|a)z)$", archive_name) is not None:
-        # Matches:
-        # .tar.gz
-        # .tar.z
-        # .tgz
-        # .taz
-        bins = ["pigz", "gzip"]
-        binary, binary_path = find_binaries(bins)
 
-        if binary:
-            command = ["tar", "-cf", archive_name, "--use-compress-program", binary_path, *flags, *files]
-            return command
-
-    elif search(r"\.g*z$", archive_name) is not None:
-        # Matches:
-        # .gz
-        # .z
-        bins = ["pigz", "gzip"]
-        binary, binary_path = find_binaries(bins)
-        flags_mod = flags + ['-k']
+def _compress_rar(
+        binary: str,
+        binary_path: str,
+        archive_name: str,
+        flags: Tuple[str, ...],
+        files: Tuple[str, ...]) -> List[str]:
+    """Returns rar compression command"""
+    command = [binary_path, "a", *flags, archive_name, *files]
+    return command
 
-        if binary:
-            command = [binary_path, *flags_mod, *files]
-            return command
 
-    elif search(r"\.tar\.lz4$", archive_name) is not None:
-        bins = ["lz4"]
-        binary, binary_path = find_binaries(bins)
-        if binary:
-            command = ["tar", "-cf", archive_name, "--use-compress-program", binary_path, *flags, *files]
-            return command
+def _compress_zip(
+        binary: str,
+        binary_path: str,
+        archive_name: str,
+        flags: Tuple[str, ...],
+        files: Tuple[str, ...]) -> Optional[List[str]]:
+    """Returns zip compression command"""
+    # -r enables recursion into subdirs
+    if binary == 'zip':
+        command = [binary_path, *flags, "-r", archive_name, *files]
+        return command
+    elif binary == '7z':
+        command = [binary_path, "a", *flags, "-r", archive_name, *files]
+        return command
+    return None
+
+
+def _compress_zpaq(
+        binary: str,
+        binary_path: str,
+        archive_name: str,
+        flags: Tuple[str, ...],
+        files: Tuple[str, ...]) -> List[str]:
+    """Returns zpaq compression command"""
+    command = [binary_path, "a", archive_name, *files, *flags]
+    return command
 
-    elif search(r"\.lz4$", archive_name) is not None:
-        bins = ["lz4"]
-        binary, binary_path = find_binaries(bins)
-        if binary:
-            if len(files) > 1:
-                flags_mod = flags + ['-m']
-                # multiple files imply automatic output names
-                command = [binary_path, *flags_mod, *files]
-            else:
-                command = [binary_path, *flags, *files, archive_name]
-            return command
-
-    elif search(r"\.tar\.lrz$", archive_name) is not None:
-        bins = ["lrzip"]
-        binary, binary_path = find_binaries(bins)
-        if binary:
-            command = ["tar", "-cf", archive_name, "--use-compress-program", binary_path, *flags, *files]
-            return command
 
-    elif search(r"\.lrz$", archive_name) is not None:
-        bins = ["lrzip"]
-        binary, binary_path = find_binaries(bins)
-        if binary:
-            command = [binary_path, *flags, *files]
-            return command
+def _compress_lha(
+        binary: str,
+        binary_path: str,
+        archive_name: str,
+        flags: Tuple[str, ...],
+        files: Tuple[str, ...]) -> List[str]:
+    """Returns lha compression command"""
+    command = [binary_path, "c", *flags, archive_name, *files]
+    return command
 
-    elif search(r"\.tar\.lz$", archive_name) is not None:
-        bins = ["plzip", "lzip"]
-        binary, binary_path = find_binaries(bins)
-        if binary:
-            command = ["tar", "-cf", archive_name, "--use-compress-program", binary_path, *flags, *files]
-            return command
 
-    elif search(r"\.lz$", archive_name) is not None:
-        bins = ["plzip", "lzip"]
-        binary, binary_path = find_binaries(bins)
-        if binary:
-            flags_mod = flags + ['-k']
-            command = [binary_path, *flags_mod, *files]
-            return command
-
-    elif search(r"\.(tar\.lzop|tzo)$", archive_name) is not None:
-        # Matches:
-        # .tar.lzop
-        # .tzo
-        bins = ["lzop"]
-        binary, binary_path = find_binaries(bins)
-        if binary:
-            command = ["tar", "-cf", archive_name, "--use-compress-program", binary_path, *flags, *files]
-            return command
+def _compress_tar(
+        binary: str,
+        binary_path: str,
+        archive_name: str,
+        flags: Tuple[str, ...],
+        files: Tuple[str, ...]) -> Optional[List[str]]:
+    """Returns uncompressed tar archiving command"""
+    if binary == "tar":
+        command = [binary_path, "-cf", *flags, archive_name, *files]
+        return command
+    elif binary == "7z":
+        command = [binary_path, "a", *flags, archive_name, *files]
+        return command
+    return None
+
+
+def _extract_tarball(
+        binary: str,
+        binary_path: str,
+        archive_name: str,
+        flags: Tuple[str, ...],
+        to_dir: Optional[str]) -> List[str]:
+    """Returns tarball extraction command"""
+    output_flags = ['-C', to_dir] if to_dir else []
+    command = [binary_path, "-xf", archive_name, *flags, *output_flags]
+    return command
 
-    elif search(r"\.lzop$", archive_name) is not None:
-        # Matches:
-        # .lzop
-        bins = ["lzop"]
-        binary, binary_path = find_binaries(bins)
-        if binary:
-            if len(files) > 1:
-                command = [binary_path, *flags, *files]
-            else:
-                command = [binary_path, *flags, '-o', archive_name, *files]
-            return command
-
-    elif search(r"\.(tar\.(xz|lzma)|t(xz|lz))$", archive_name) is not None:
-        # Matches:
-        # .tar.xz
-        # .tar.lzma
-        # .txz
-        # .tlz
-        bins = ["pixz", "xz"]
-        binary, binary_path = find_binaries(bins)
-        if binary:
-            command = ["tar", "-cf", archive_name, "--use-compress-program", binary_path, *flags, *files]
-            return command
-
-    elif search(r"\.(xz|lzma)$", archive_name) is not None:
-        # Matches:
-        # .xz
-        # .lzma
-        bins = ["pixz", "xz"]
-        binary, binary_path = find_binaries(bins)
-        if binary:
-            command = [binary_path, *flags, *files]
-            return command
 
-    elif search(r"\.tar\.zst$", archive_name) is not None:
-        bins = ["zstd"]
-        binary, binary_path = find_binaries(bins)
-        if binary:
-            command = ["tar", "-cf", archive_name, "--use-compress-program", binary_path, *flags, *files]
-            return command
+def _extract_7z(
+        binary: str,
+        binary_path: str,
+        archive_name: str,
+        flags: Tuple[str, ...],
+        to_dir: Optional[str]) -> List[str]:
+    """Returns 7z extraction command"""
+    output_flags = ['-o{}'.format(to_dir)] if to_dir else []
+    command = [binary_path, "x", *flags, *output_flags, archive_name]
+    return command
 
-    elif search(r"\.7z$", archive_name) is not None:
-        bins = ["7z"]
-        binary, binary_path = find_binaries(bins)
-        flags_mod = flags + ["-r"]  # enable recursion into subdirs
-        if binary:
-            command = [binary, "a", *flags_mod, archive_name, *files]
-            return command
 
-    elif search(r"\.rar$", archive_name) is not None:
-        bins = ["rar"]
-        binary, binary_path = find_binaries(bins)
-        flags_mod = flags
-        if binary:
-            command = [binary_path, "a", *flags_mod, archive_name, *files]
-            return command
+def _extract_rar(
+        binary: str,
+        binary_path: str,
+        archive_name: str,
+        flags: Tuple[str, ...],
+        to_dir: Optional[str]) -> Optional[List[str]]:
+    """Returns rar extraction command"""
+    if binary in {'rar', 'unrar'}:
+        command = [binary_path, "x", *flags, archive_name]
+        if to_dir:
+            command += [to_dir]
+        return command
+    elif binary == '7z':
+        return _extract_7z(binary, binary_path, archive_name, flags, to_dir)
+    return None
+
+
+def _extract_zip(
+        binary: str,
+        binary_path: str,
+        archive_name: str,
+        flags: Tuple[str, ...],
+        to_dir: Optional[str]) -> Optional[List[str]]:
+    """Returns zip extraction command"""
+    if binary == 'unzip':
+        command = [binary_path, *flags, archive_name]
+        if to_dir:
+            command += ['-d', to_dir]
+        return command
+    elif binary == '7z':
+        return _extract_7z(binary, binary_path, archive_name, flags, to_dir)
+    return None
+
+
+def _extract_zpaq(
+        binary: str,
+        binary_path: str,
+        archive_name: str,
+        flags: Tuple[str, ...],
+        to_dir: Optional[str]) -> List[str]:
+    """Returns zpaq extraction command"""
+    command = [binary_path, "x", archive_name, *flags]
+    return command
 
-    elif search(r"\.zip$", archive_name) is not None:
-        bins = ["zip", "7z"]
-        binary, binary_path = find_binaries(bins)
-        flags_mod = flags + ["-r"]  # enable recursion into subdirs
 
-        if binary == 'zip':
-            command = [binary_path, *flags_mod, archive_name, *files]
-            return command
-        elif binary == '7z':
-            command = [binary_path, "a", *flags_mod, archive_name, *files]
-            return command
+def _extract_lha(
+        binary: str,
+        binary_path: str,
+        archive_name: str,
+        flags: Tuple[str, ...],
+        to_dir: Optional[str]) -> List[str]:
+    """Returns lha extraction command"""
+    output_flags = ['w={}'.format(to_dir)] if to_dir else []
+    command = [binary_path, "x", *flags, *output_flags, archive_name]
+    return command
 
-    elif search(r"\.zpaq$", archive_name) is not None:
-        bins = ["zpaq"]
-        binary, binary_path = find_binaries(bins)
 
-        if binary:
-            command = [binary_path, "a", archive_name, *files, *flags]
-            return command
-
-    elif search(r"\.l(zh|ha)$", archive_name) is not None:
-        # Matches:
-        # .lzh
-        # .lha
-        bins = ["lha"]
+def _extract_tar(
+        binary: str,
+        binary_path: str,
+        archive_name: str,
+        flags: Tuple[str, ...],
+        to_dir: Optional[str]) -> Optional[List[str]]:
+    """Returns uncompressed tar extraction command"""
+    if binary == "tar":
+        output_flags = ['-C', to_dir] if to_dir else []
+        command = [binary_path, "-xf", *flags, *output_flags, archive_name]
+        return command
+    elif binary == "7z":
+        return _extract_7z(binary, binary_path, archive_name, flags, to_dir)
+    return None
+
+
+def _extract_deb(
+        binary: str,
+        binary_path: str,
+        archive_name: str,
+        flags: Tuple[str, ...],
+        to_dir: Optional[str]) -> List[str]:
+    """Returns deb package extraction command"""
+    output_flags = ['--output={}'.format(to_dir)] if to_dir else []
+    command = [binary_path, "xv", *flags, *output_flags, archive_name]
+    return command
+
+
+_BZIP2_BINS = ("pbzip2", "lbzip2", "bzip2")
+_GZIP_BINS = ("pigz", "gzip")
+_LZIP_BINS = ("plzip", "lzip")
+_XZ_BINS = ("pixz", "xz")
+
+# Maps lowercased archive suffixes to candidate binaries and a function
+# building the compression command for the binary that was found
+_COMPRESS_DISPATCH = {
+    ".tar.bz2": (_BZIP2_BINS, _compress_tarball),
+    ".tar.bz": (_BZIP2_BINS, _compress_tarball),
+    ".tbz2": (_BZIP2_BINS, _compress_tarball),
+    ".tbz": (_BZIP2_BINS, _compress_tarball),
+    ".bz2": (_BZIP2_BINS, _compress_files_keep),
+    ".bz": (_BZIP2_BINS, _compress_files_keep),
+    ".tar.gz": (_GZIP_BINS, _compress_tarball),
+    ".tar.z": (_GZIP_BINS, _compress_tarball),
+    ".tgz": (_GZIP_BINS, _compress_tarball),
+    ".taz": (_GZIP_BINS, _compress_tarball),
+    ".gz": (_GZIP_BINS, _compress_files_keep),
+    ".z": (_GZIP_BINS, _compress_files_keep),
+    ".tar.lz4": (("lz4",), _compress_tarball),
+    ".lz4": (("lz4",), _compress_lz4),
+    ".tar.lrz": (("lrzip",), _compress_tarball),
+    ".lrz": (("lrzip",), _compress_files),
+    ".tar.lz": (_LZIP_BINS, _compress_tarball),
+    ".lz": (_LZIP_BINS, _compress_files_keep),
+    ".tar.lzop": (("lzop",), _compress_tarball),
+    ".tzo": (("lzop",), _compress_tarball),
+    ".lzop": (("lzop",), _compress_lzop),
+    ".tar.xz": (_XZ_BINS, _compress_tarball),
+    ".tar.lzma": (_XZ_BINS, _compress_tarball),
+    ".txz": (_XZ_BINS, _compress_tarball),
+    ".tlz": (_XZ_BINS, _compress_tarball),
+    ".xz": (_XZ_BINS, _compress_files),
+    ".lzma": (_XZ_BINS, _compress_files),
+    ".tar.zst": (("zstd",), _compress_tarball),
+    ".7z": (("7z",), _compress_7z),
+    ".rar": (("rar",), _compress_rar),
+    ".zip": (("zip", "7z"), _compress_zip),
+    ".zpaq": (("zpaq",), _compress_zpaq),
+    ".lzh": (("lha",), _compress_lha),
+    ".lha": (("lha",), _compress_lha),
+    ".tar": (("tar", "7z"), _compress_tar),
+}
+
+# Same for decompression commands. Tarballs are unpacked by tar, which
+# detects the compression program itself
+_DECOMPRESS_DISPATCH = {
+    **{suffix: (("tar",), _extract_tarball)
+       for suffix, (_, build_command) in _COMPRESS_DISPATCH.items()
+       if build_command is _compress_tarball},
+    ".7z": (("7z",), _extract_7z),
+    ".rar": (("7z", "unrar", "rar"), _extract_rar),
+    ".zip": (("7z", "unzip"), _extract_zip),
+    ".zpaq": (("zpaq",), _extract_zpaq),
+    ".lzh": (("lha",), _extract_lha),
+    ".lha": (("lha",), _extract_lha),
+    ".tar": (("tar", "7z"), _extract_tar),
+    ".deb": (("ar",), _extract_deb),
+}
+
+_KNOWN_SUFFIXES = frozenset({*_COMPRESS_DISPATCH, *_DECOMPRESS_DISPATCH})
+
+
+def _suffix(archive_name: str) -> str:
+    """Returns the longest known archive suffix of a filename"""
+    # Known suffixes have one or two dots, so only the last two
+    # extensions are looked up, longest first, so that ".tar.gz"
+    # wins over ".gz"
+    extensions = archive_name.lower().rsplit(".", 2)[1:]
+    for i in range(len(extensions)):
+        suffix = "." + ".".join(extensions[i:])
+        if suffix in _KNOWN_SUFFIXES:
+            return suffix
+    return ""
+
+
+def _dispatch(dispatch: dict, archive_name: str, *args) -> Optional[List[str]]:
+    """Builds a command with the first available binary listed for
+    the archive suffix in a dispatch table
+    """
+    handler = dispatch.get(_suffix(archive_name))
+
+    if handler:
+        bins, build_command = handler
         binary, binary_path = find_binaries(bins)
 
         if binary:
-            command = [binary_path, "c", *flags, archive_name, *files]
-            return command
+            return build_command(binary, binary_path, archive_name, *args)
+    return None
 
-    # elif search(r"\.cpio$", archive_name) is not None:
-    #     bins = ["cpio"]
 
-    elif search(r"\.tar$", archive_name) is not None:
-        bins = ["tar", "7z"]
-        binary, binary_path = find_binaries(bins)
+def get_compression_command(
+        archive_name: str,
+        flags: List[str],
+        files: List[str]) -> List[str]:
+    """Returns compression command"""
+    return list(_compression_command(
+        archive_name, tuple(flags), tuple(files), environ.get("PATH")))
 
-        if binary == "tar":
-            command = [binary_path, "-cf", *flags, archive_name, *files]
-            return command
-        elif binary == "7z":
-            command = [binary_path, "a", *flags, archive_name, *files]
-            return command
 
-    fallback_command = ["zip", "-r", f"{archive_name}.zip"] + files
+@lru_cache(maxsize=256)
+def _compression_command(
+        archive_name: str,
+        flags: Tuple[str, ...],
+        files: Tuple[str, ...],
+        path: Optional[str]) -> List[str]:
+    """Builds compression command. PATH is only a part of the cache key,
+    as it determines which binaries are found
+    """
+    command = _dispatch(_COMPRESS_DISPATCH, archive_name, flags, files)
+    if command:
+        return command
+
+    fallback_command = ["zip", "-r", f"{archive_name}.zip", *files]
     return fallback_command
 
 
+def ensure_dir(path: str) -> None:
+    """Creates a directory with its parents unless it already exists"""
+    # A single stat() for the common case of an existing directory,
+    # which makedirs() only finds out after failing to create it
+    if not isdir(path):
+        makedirs(path, exist_ok=True)
+
+
 def get_decompression_command(
         archive_name: str,
         flags: list,
         to_dir: str = None) -> List[str]:
-    """Returns decompression command"""
-    tar_full = r"\.tar\.(bz2*|g*z|lz(4|ma)|lr*z|lzop|xz|zst)$"
-    tar_short = r"\.t(a|b|g|l|x)z2*"
+    """Returns decompression command. The target directory is not
+    created here, see ensure_dir(). Flags are not modified, so one list
+    can be passed for several archives
+    """
+    return list(_decompression_command(
+        archive_name, tuple(flags), to_dir, environ.get("PATH")))
 
-    if to_dir:
-        makedirs(to_dir, exist_ok=True)
 
-    if search(tar_full, archive_name) is not None or\
-            search(tar_short, archive_name) is not None:
-        # Matches all supported tarballs
-        bins = ["tar"]
-        binary, binary_path = find_binaries(bins)
-
-        if binary:
-            if to_dir:
-                flags += ['-C', to_dir]
-            command = [binary_path, "-xf", archive_name, *flags]
-            return command
-
-    elif search(r"\.7z$", archive_name) is not None:
-        bins = ["7z"]
-        binary, binary_path = find_binaries(bins)
-        if binary:
-            if to_dir:
-                flags += ['-o{}'.format(to_dir)]
-            command = [binary, "x", *flags, archive_name]
-            return command
-
-    elif search(r"\.rar$", archive_name) is not None:
-        bins = ["7z", "unrar", "rar"]
-        binary, binary_path = find_binaries(bins)
-
-        if binary == 'rar' or binary == 'unrar':
-            command = [binary_path, "x", *flags, archive_name]
-            if to_dir:
-                command += [to_dir]
-            return command
-        elif binary == '7z':
-            if to_dir:
-                flags += ['-o{}'.format(to_dir)]
-            command = [binary_path, "x", *flags, archive_name]
-            return command
-
-    elif search(r"\.zip$", archive_name) is not None:
-        bins = ["7z", "unzip"]
-        binary, binary_path = find_binaries(bins)
-
-        if binary == 'unzip':
-            command = [binary_path, *flags, archive_name]
-            if to_dir:
-                command += ['-d', to_dir]
-            return command
-        elif binary == '7z':
-            if to_dir:
-                flags += ['-o{}'.format(to_dir)]
-            command = [binary_path, "x", *flags, archive_name]
-            return command
-
-    elif search(r"\.zpaq$", archive_name) is not None:
-        bins = ["zpaq"]
-        binary, binary_path = find_binaries(bins)
-
-        if binary:
-            command = [binary_path, "x", archive_name, *flags]
-            return command
-
-    elif search(r"\.l(zh|ha)$", archive_name) is not None:
-        # Matches:
-        # .lzh
-        # .lha
-        bins = ["lha"]
-        binary, binary_path = find_binaries(bins)
-
-        if binary:
-            if to_dir:
-                flags += ['w={}'.format(to_dir)]
-            command = [binary_path, "x", *flags, archive_name]
-            return command
-
-    elif search(r"\.tar$", archive_name) is not None:
-        bins = ["tar", "7z"]
-        binary, binary_path = find_binaries(bins)
-
-        if binary == "tar":
-            if to_dir:
-                flags += ['-C', to_dir]
-            command = [binary_path, "-xf", *flags, archive_name]
-            return command
-        elif binary == "7z":
-            if to_dir:
-                flags += ['-o{}'.format(to_dir)]
-            command = [binary_path, "x", *flags, archive_name]
-            return command
-
-    elif search(r"\.deb$", archive_name) is not None:
-        # Matches:
-        # .deb
-        bins = ["ar"]
-        binary, binary_path = find_binaries(bins)
-
-        if binary:
-            if to_dir:
-                flags += ['--output={}'.format(to_dir)]
-            command = [binary_path, "xv", *flags, archive_name]
-            return command
+@lru_cache(maxsize=256)
+def _decompression_command(
+        archive_name: str,
+        flags: Tuple[str, ...],
+        to_dir: Optional[str],
+        path: Optional[str]) -> List[str]:
+    """Builds decompression command. PATH is only a part of the cache key,
+    as it determines which binaries are found
+    """
+    command = _dispatch(_DECOMPRESS_DISPATCH, archive_name, flags, to_dir)
+    if command:
+        return command
 
     fallback_command = ["7z", "x", archive_name] +\
         (['-o{}'.format(to_dir)] if to_dir else [])
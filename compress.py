@@ -1,9 +1,12 @@
 import os.path
-from re import search
+import re
 from ranger.api.commands import Command
 from ranger.core.loader import CommandLoader
 from .archives_utils import parse_escape_args, get_compression_command
 
+# Matches an archive filename with an extension
+_ARCHIVE_NAME_RE = re.compile(r".*?\.\w+")
+
 
 class compress(Command):
     def execute(self):
@@ -16,7 +19,13 @@ class compress(Command):
             return
 
         # Preparing names of archived files
-        filenames = [os.path.relpath(f.path, cwd.path) for f in marked_files]
+        # Marked files are normally in the current dir, so their relative
+        # paths are just sliced off instead of computed with relpath()
+        prefix = os.path.join(cwd.path, '')
+        filenames = [
+            f.path[len(prefix):] if f.path.startswith(prefix)
+            else os.path.relpath(f.path, cwd.path)
+            for f in marked_files]
 
         # Parsing arguments
         flags = parse_escape_args(self.line.strip())[1:]
@@ -25,7 +34,7 @@ class compress(Command):
         if flags:
             flags_last = flags.pop()
 
-            if search(r".*?\.\w+", flags_last) is None:
+            if _ARCHIVE_NAME_RE.search(flags_last) is None:
                 flags += [flags_last]
             else:
                 archive_name = flags_last
@@ -1,88 +1,85 @@
 import os
-import pathlib
 from ranger.api.commands import Command
 from ranger.core.loader import CommandLoader
-from .archives_utils import parse_escape_args, get_decompression_command
+from .archives_utils import (
+    parse_escape_args, get_decompression_command, ensure_dir)
 
 
-class extract(Command):
+class _ExtractBase(Command):
+    def _clear_buffers(self):
+        """Clears copied and cut files"""
+        self.fm.copy_buffer.clear()
+        self.fm.cut_buffer = False
+
+    def _extract_file(self, cwd, file, command):
+        """Runs extraction command and refreshes current directory
+        when it is done
+        """
+        def refresh(_):
+            _cwd = self.fm.get_directory(cwd.path)
+            _cwd.load_content()
+
+        descr = f"Extracting: {os.path.basename(file.path)}"
+        obj = CommandLoader(args=command, descr=descr, read=True)
+        obj.signal_bind('after', refresh)
+        self.fm.loader.add(obj)
+
+
+class extract(_ExtractBase):
     def execute(self):
         """Extract copied files to current directory or directory
         specified in a command line
         """
         cwd = self.fm.thisdir
         files = cwd.get_selection()
-        cwd = self.fm.thisdir
 
         if not files:
             return
 
-        def refresh(_):
-            _cwd = self.fm.get_directory(cwd.path)
-            _cwd.load_content()
-
         dirname = " ".join(self.line.strip().split()[1:])
-        self.fm.copy_buffer.clear()
-        self.fm.cut_buffer = False
+        self._clear_buffers()
+
+        if dirname:
+            ensure_dir(dirname)
 
         for file in files:
-            descr = f"Extracting: {os.path.basename(file.path)}"
             command = get_decompression_command(file.path, [], dirname)
-            obj = CommandLoader(args=command, descr=descr, read=True)
-            obj.signal_bind('after', refresh)
-            self.fm.loader.add(obj)
+            self._extract_file(cwd, file, command)
 
 
-class extract_raw(Command):
+class extract_raw(_ExtractBase):
     def execute(self):
         """Extract copied files to current directory or directory
         specified in a command line
         """
         cwd = self.fm.thisdir
         files = cwd.get_selection()
-        cwd = self.fm.thisdir
 
         if not files:
             return
 
-        def refresh(_):
-            _cwd = self.fm.get_directory(cwd.path)
-            _cwd.load_content()
-
         flags = parse_escape_args(self.line.strip())[1:]
-        self.fm.copy_buffer.clear()
-        self.fm.cut_buffer = False
+        self._clear_buffers()
 
         for file in files:
-            descr = f"Extracting: {os.path.basename(file.path)}"
-            command = get_decompression_command(file.path, flags.copy())
-            obj = CommandLoader(args=command, descr=descr, read=True)
-            obj.signal_bind('after', refresh)
-            self.fm.loader.add(obj)
+            command = get_decompression_command(file.path, flags)
+            self._extract_file(cwd, file, command)
 
 
-class extract_to_dirs(Command):
+class extract_to_dirs(_ExtractBase):
     def execute(self):
         """Extract copied files to a subdirectories"""
         cwd = self.fm.thisdir
         files = cwd.get_selection()
-        cwd = self.fm.thisdir
 
         if not files:
             return
 
-        def refresh(_):
-            _cwd = self.fm.get_directory(cwd.path)
-            _cwd.load_content()
-
         flags = parse_escape_args(self.line.strip())[1:]
-        self.fm.copy_buffer.clear()
-        self.fm.cut_buffer = False
+        self._clear_buffers()
 
         for file in files:
-            descr = f"Extracting: {os.path.basename(file.path)}"
-            dirname = pathlib.Path(file.path).stem
-            command = get_decompression_command(file.path, flags.copy(), dirname)
-            obj = CommandLoader(args=command, descr=descr, read=True)
-            obj.signal_bind('after', refresh)
-            self.fm.loader.add(obj)
+            dirname = os.path.splitext(os.path.basename(file.path))[0]
+            ensure_dir(dirname)
+            command = get_decompression_command(file.path, flags, dirname)
+            self._extract_file(cwd, file, command)